@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+    benchmarks.loadtest
+    ~~~~~~~~~~~~~~~~~~~
+
+    End-to-end load driver for Flask-URS. Logs in through `URS.callback` and
+    calls a `jwt_required` view concurrently, against a fake URS server from
+    `flask_urs.testing`, and reports throughput, tail latency and connection
+    counts.
+
+    Load comes from ``--processes`` driver processes with ``--concurrency``
+    threads each, whose latencies are merged for the report. By default the
+    fake URS server and the app under test each run in their own process on a
+    threaded keep-alive werkzeug server, so driver, app and upstream do not
+    share a GIL::
+
+        python benchmarks/loadtest.py --workload mixed --processes 4 --concurrency 16 \\
+            --latency 0.08
+
+    The default app is still a single werkzeug process. To size a fleet, run
+    the app under a production WSGI server and point the driver at it::
+
+        python -m flask_urs.testing --port 5001 --latency 0.08
+        URS_HOST=http://127.0.0.1:5001 gunicorn -w 4 -b 127.0.0.1:8000 \\
+            --chdir benchmarks 'loadtest:create_app()'
+        python benchmarks/loadtest.py --target http://127.0.0.1:8000 \\
+            --urs http://127.0.0.1:5001 --processes 4
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import threading
+import time
+import timeit
+
+import requests
+from flask import Flask, jsonify
+
+import flask_urs
+from flask_urs.testing import create_fake_urs, make_server
+
+WORKLOADS = ('login', 'verify', 'mixed')
+KINDS = ('login', 'verify')
+
+
+def create_app(urs_host=None):
+    """Create the app under test, talking to the URS server at `urs_host`."""
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'loadtest'
+    app.config['URS_HOST'] = urs_host or os.environ['URS_HOST']
+    app.config['URS_TOKEN_PATH'] = '/oauth/token'
+    app.config['URS_UID'] = 'loadtest'
+    app.config['URS_PASSWORD'] = 'loadtest'
+
+    urs = flask_urs.URS(app)
+
+    @urs.response_handler
+    def response_callback(user, jwt, access):
+        return jsonify({'jwt': jwt})
+
+    @app.errorhandler(flask_urs.URSError)
+    def handle_urs_error(error):
+        return jsonify({'error': error.error, 'description': error.description}), \
+            error.status_code
+
+    @app.route('/protected')
+    @flask_urs.jwt_required()
+    def protected():
+        return 'ok'
+
+    return app
+
+
+def _serve(factory, kwargs, ready):
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server(factory(**kwargs))
+    ready.put(server.server_port)
+    server.serve_forever()
+
+
+def start_server(factory, **kwargs):
+    """Serve ``factory(**kwargs)`` in a new process and return it with its URL."""
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(factory, kwargs, ready))
+    process.daemon = True
+    process.start()
+    return process, 'http://127.0.0.1:%d' % ready.get(timeout=30)
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    index = max(int(round(p / 100.0 * len(values))) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+def client_connections(session):
+    total = 0
+    for adapter in session.adapters.values():
+        for key in adapter.poolmanager.pools.keys():
+            total += adapter.poolmanager.pools[key].num_connections
+    return total
+
+
+class Worker(threading.Thread):
+    def __init__(self, target, token, workload, login_ratio, users, deadline, seed):
+        super(Worker, self).__init__()
+        self.daemon = True
+        self.target = target
+        self.token = token
+        self.workload = workload
+        self.login_ratio = login_ratio
+        self.users = users
+        self.deadline = deadline
+        self.rng = random.Random(seed)
+        self.session = requests.Session()
+        self.latencies = dict((kind, []) for kind in KINDS)
+        self.errors = dict((kind, 0) for kind in KINDS)
+
+    def choose(self):
+        if self.workload == 'mixed':
+            return 'login' if self.rng.random() < self.login_ratio else 'verify'
+        return self.workload
+
+    def request(self, kind):
+        if kind == 'login':
+            code = 'user%d' % self.rng.randint(1, self.users)
+            return self.session.get(self.target + '/urs/callback', params={'code': code})
+        return self.session.get(self.target + '/protected',
+                                headers={'Authorization': 'Bearer ' + self.token})
+
+    def run(self):
+        clock = timeit.default_timer
+        # Wall clock for the deadline, it is shared by all driver processes.
+        while time.time() < self.deadline:
+            kind = self.choose()
+            start = clock()
+            try:
+                ok = self.request(kind).status_code == 200
+            except requests.RequestException:
+                ok = False
+            if ok:
+                self.latencies[kind].append(clock() - start)
+            else:
+                self.errors[kind] += 1
+
+
+def _drive(args, target, token, deadline, index, results):
+    workers = [Worker(target, token, args.workload, args.login_ratio, args.users, deadline,
+                      args.seed + index * args.concurrency + i)
+               for i in range(args.concurrency)]
+
+    start = time.time()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    results.put({
+        'start': start,
+        'end': time.time(),
+        'latencies': dict((kind, [t for w in workers for t in w.latencies[kind]])
+                          for kind in KINDS),
+        'errors': dict((kind, sum(w.errors[kind] for w in workers)) for kind in KINDS),
+        'connections': sum(client_connections(w.session) for w in workers),
+    })
+
+
+def drive(args, target, token):
+    """Run the workload from ``args.processes`` processes and merge their results."""
+    deadline = time.time() + args.duration
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_drive,
+                                         args=(args, target, token, deadline, i, queue))
+                 for i in range(args.processes)]
+    for p in processes:
+        p.start()
+    # Drain the queue before joining, large results would otherwise block the children.
+    results = [queue.get() for _ in processes]
+    for p in processes:
+        p.join()
+
+    return {
+        'elapsed': max(r['end'] for r in results) - min(r['start'] for r in results),
+        'latencies': dict((kind, sorted(t for r in results for t in r['latencies'][kind]))
+                          for kind in KINDS),
+        'errors': dict((kind, sum(r['errors'][kind] for r in results)) for kind in KINDS),
+        'connections': sum(r['connections'] for r in results),
+    }
+
+
+def login(target, attempts=20):
+    """Log in once to get a token for the verify workload, retrying failures such
+    as errors injected by the fake URS server."""
+    for _ in range(attempts):
+        try:
+            r = requests.get(target + '/urs/callback', params={'code': 'warmup'})
+        except requests.RequestException:
+            continue
+        if r.status_code == 200:
+            return r.json()['jwt']
+    raise SystemExit('warm-up login failed %d times, is --error-rate too high?' % attempts)
+
+
+def report(results, urs_stats):
+    elapsed = results['elapsed']
+    print('%-8s %9s %7s %9s %8s %8s %8s %8s' % (
+        'kind', 'requests', 'errors', 'req/s', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms'))
+    for kind in KINDS:
+        latencies = results['latencies'][kind]
+        errors = results['errors'][kind]
+        if not latencies and not errors:
+            continue
+        print('%-8s %9d %7d %9.1f %8.2f %8.2f %8.2f %8.2f' % (
+            kind, len(latencies), errors, len(latencies) / elapsed,
+            percentile(latencies, 50) * 1000, percentile(latencies, 90) * 1000,
+            percentile(latencies, 99) * 1000, (latencies[-1] if latencies else 0) * 1000))
+
+    print('client connections  %d' % results['connections'])
+    if urs_stats:
+        print('urs connections     %d' % urs_stats.get('connections', 0))
+        print('urs requests        token=%d profile=%d errors=%d' % (
+            urs_stats.get('token', 0), urs_stats.get('profile', 0),
+            urs_stats.get('errors', 0)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Flask-URS end-to-end load driver.')
+    parser.add_argument('--workload', choices=WORKLOADS, default='mixed')
+    parser.add_argument('--login-ratio', type=float, default=0.1,
+                        help='fraction of logins in the mixed workload')
+    parser.add_argument('--processes', type=int, default=1, help='driver processes')
+    parser.add_argument('--concurrency', type=int, default=16,
+                        help='threads per driver process')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds')
+    parser.add_argument('--users', type=int, default=1000,
+                        help='distinct users logging in')
+    parser.add_argument('--target', help='URL of an already running app under test')
+    parser.add_argument('--urs', help='URL of an already running URS server')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='fake URS latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.processes < 1 or args.concurrency < 1:
+        parser.error('--processes and --concurrency must be at least 1')
+
+    servers = []
+    urs_url = args.urs
+    if urs_url is None:
+        process, urs_url = start_server(create_fake_urs, latency=args.latency,
+                                        jitter=args.jitter, error_rate=args.error_rate,
+                                        seed=args.seed)
+        servers.append(process)
+
+    target = args.target
+    if target is None:
+        process, target = start_server(create_app, urs_host=urs_url)
+        servers.append(process)
+
+    try:
+        results = drive(args, target, login(target))
+
+        try:
+            urs_stats = requests.get(urs_url + '/stats').json()
+        except (requests.RequestException, ValueError):
+            urs_stats = None
+    finally:
+        for process in servers:
+            process.terminate()
+
+    report(results, urs_stats)
+
+
+if __name__ == '__main__':
+    main()
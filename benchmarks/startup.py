@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+    benchmarks.startup
+    ~~~~~~~~~~~~~~~~~~
+
+    Cold start cost of Flask-URS. Each sample runs in a fresh interpreter and
+    reports the time to import the extension, the time to build an app around
+    it and the peak resident set size.
+
+    Usage::
+
+        python benchmarks/startup.py [--samples 20] [--verify-only]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+SAMPLE = """
+import json, resource, sys, time
+
+start = time.time()
+import flask_urs
+imported = time.time()
+
+from flask import Flask
+app = Flask('bench')
+app.config['SECRET_KEY'] = 'bench'
+app.config['URS_CALLBACK_ENABLED'] = %(callback)r
+flask_urs.URS(app)
+initialized = time.time()
+
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == 'darwin':
+    rss = rss // 1024
+
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'init_ms': (initialized - imported) * 1000,
+    'rss_kb': rss,
+    'requests_loaded': 'requests' in sys.modules,
+}))
+"""
+
+
+def median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    if len(values) % 2:
+        return values[mid]
+    return (values[mid - 1] + values[mid]) / 2.0
+
+
+def run(samples, callback):
+    code = SAMPLE % {'callback': callback}
+    results = []
+    for _ in range(samples):
+        out = subprocess.check_output([sys.executable, '-c', code])
+        results.append(json.loads(out.decode('utf-8')))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, default=20)
+    parser.add_argument('--verify-only', action='store_true',
+                        help='disable the URS callback blueprint')
+    args = parser.parse_args()
+
+    results = run(args.samples, not args.verify_only)
+
+    print('samples          %d' % len(results))
+    print('import (ms)      %.2f' % median([r['import_ms'] for r in results]))
+    print('init_app (ms)    %.2f' % median([r['init_ms'] for r in results]))
+    print('peak rss (kb)    %d' % median([r['rss_kb'] for r in results]))
+    print('requests loaded  %s' % any(r['requests_loaded'] for r in results))
+
+
+if __name__ == '__main__':
+    main()
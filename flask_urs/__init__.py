@@ -6,7 +6,7 @@
     Flask-URS-JWT module
 """
 
-from flask import current_app, render_template, Blueprint, request, jsonify
+from flask import current_app, Blueprint, request, jsonify
 
 from flask import _app_ctx_stack as stack
 from itsdangerous import (
@@ -15,11 +15,14 @@ from itsdangerous import (
     BadSignature
 )
 from functools import wraps
+from threading import Lock
 from werkzeug.local import LocalProxy
-import requests
 from datetime import timedelta
 from collections import OrderedDict
 
+from .callback import callback_response, check_callback_mode
+from .callback import precompile_callback_template  # noqa: re-exported
+
 __version__ = '0.1.3'
 
 current_user = LocalProxy(lambda: getattr(stack.top, 'current_user', None))
@@ -27,16 +30,21 @@ current_user = LocalProxy(lambda: getattr(stack.top, 'current_user', None))
 _urs = LocalProxy(lambda: current_app.extensions['urs'])
 
 CONFIG_DEFAULTS = {
+    'URS_CALLBACK_ENABLED': True,
     'URS_CALLBACK_RULE': '/callback',
     'URS_URL_PREFIX': '/urs',
     'URS_CALLBACK_TEMPLATE': 'urs/callback.html',
+    'URS_CALLBACK_MODE': 'template',
+    'URS_CALLBACK_REDIRECT': '/',
     'JWT_EXPIRATION_DELTA': 3600,
     'JWT_EXPIRATION_LEEWAY': 100,
     'JWT_VERIFY_EXPIRATION': True,
     'JWT_ALGORITHM': 'HS256',
     'JWT_DEFAULT_REALM': 'Login Required',
     'URS_HOST': 'https://urs.earthdata.nasa.gov/',
-    'URS_TOKEN_PATH': 'oauth/token'
+    'URS_TOKEN_PATH': 'oauth/token',
+    'URS_TIMEOUT': None,
+    'URS_POOL_SIZE': 10
 }
 
 
@@ -144,9 +152,10 @@ def _default_decode_handler(token):
     """Return the decoded token."""
     try:
         result = _get_serializer().loads(token)
-    except SignatureExpired:
+    except SignatureExpired as e:
         if current_app.config['JWT_VERIFY_EXPIRATION']:
             raise
+        result = e.payload
     return result
 
 
@@ -159,7 +168,7 @@ def _default_jwt_error_handler(error):
 
 
 def _default_response_handler(user, jwt, access):
-    return render_template(CONFIG_DEFAULTS.get('URS_CALLBACK_TEMPLATE'), jwt=jwt)
+    return callback_response(jwt)
 
 
 class URS(object):
@@ -170,6 +179,7 @@ class URS(object):
         self.decode_callback = _default_decode_handler
         self.payload_callback = _default_payload_handler
         self.jwt_error_callback = _default_jwt_error_handler
+        self._client_lock = Lock()
 
         if app is not None:
             self.init_app(app)
@@ -180,18 +190,25 @@ class URS(object):
 
         app.config.setdefault('JWT_SECRET_KEY', app.config['SECRET_KEY'])
 
-        bp = Blueprint('urs_urs', __name__, template_folder='templates')
-        bp.url_prefix = app.config.get('URS_URL_PREFIX', '')
-        bp.add_url_rule(app.config.get('URS_CALLBACK_RULE'), methods=['GET'],
-                        view_func=self.callback)
+        if app.config['URS_CALLBACK_ENABLED']:
+            check_callback_mode(app.config['URS_CALLBACK_MODE'])
+
+            bp = Blueprint('urs_urs', __name__, template_folder='templates')
+            bp.url_prefix = app.config.get('URS_URL_PREFIX', '')
+            bp.add_url_rule(app.config.get('URS_CALLBACK_RULE'), methods=['GET'],
+                            view_func=self.callback)
 
-        app.register_blueprint(bp)
+            app.register_blueprint(bp)
 
         if not hasattr(app, 'extensions'):  # pragma: no cover
             app.extensions = {}
 
         app.errorhandler(JWTError)(self.jwt_error_callback)
 
+        if hasattr(app, 'cli'):  # Flask >= 0.11
+            from .cli import urs_cli
+            app.cli.add_command(urs_cli)
+
         app.extensions['urs'] = self
 
     @property
@@ -201,8 +218,29 @@ class URS(object):
 
     @property
     def _token_url(self):
-        return current_app.config.get('URS_HOST', CONFIG_DEFAULTS['URS_HOST']) \
-               + current_app.config.get('URS_TOKEN_PATH', CONFIG_DEFAULTS['URS_TOKEN_PATH'])
+        return self.get_client().token_url
+
+    def get_client(self, app=None):
+        """Return the :class:`~flask_urs.oauth.URSClient` of `app`, by default the
+        current app. It is created from the app config on first use and shared by
+        every later call, so config changes after that are not picked up. The client
+        does not need an app context and can be handed to background workers::
+
+            with app.app_context():
+                client = urs.get_client()
+
+        :param app: the Flask app
+        """
+        from .oauth import URSClient
+
+        app = app or current_app._get_current_object()
+        client = app.extensions.get('urs_client')
+        if client is None:
+            with self._client_lock:
+                client = app.extensions.get('urs_client')
+                if client is None:
+                    client = app.extensions['urs_client'] = URSClient.from_config(app.config)
+        return client
 
     def callback(self):
         code = request.args.get('code', None)
@@ -217,56 +255,17 @@ class URS(object):
         return self.response_callback(user, jwt, access)
 
     def refresh(self, refresh_token):
-        """
-        Get new access token...
-        :param refresh_token:
-        :return:
-        """
-
-        # TODO
+        """Get a new access token for a refresh token.
 
-        pass
+        :param refresh_token: the refresh token of an earlier token response
+        """
+        return self.get_client().refresh(refresh_token)
 
     def get_user(self, token, endpoint, refresh_token=None):
-        headers = {
-            "Authorization": "Bearer %s" % token
-        }
-
-        r = requests.get(current_app.config.get('URS_HOST') + endpoint, headers=headers)
-
-        if r.status_code != 200:
-            raise URSError('Invalid Code', 'No Authorization Code')
-
-        return r.json()
+        return self.get_client().get_user(token, endpoint)
 
     def get_token(self, code):
-        headers = {
-            "Content-Type": "application/x-www-form-urlencoded"
-        }
-
-        data = {
-            "grant_type": "authorization_code",
-            "code": code,
-            "redirect_uri": request.base_url
-        }
-
-        auth = requests.auth.HTTPBasicAuth(current_app.config.get('URS_UID'),
-                                           current_app.config.get('URS_PASSWORD'))
-
-        r = requests.post(self._token_url, headers=headers, data=data, auth=auth)
-
-        if r.status_code == 401:
-            raise URSError('Token Access Denied', 'Incorrect Application UID or Password',
-                           status_code=500)
-
-        elif r.status_code == 400:
-            error = r.json()
-            raise URSError(r.json()['error'], error['error_description'], status_code=500)
-
-        elif r.status_code != 200:
-            raise URSError('Unknown Error', 'Could Not Retrieve Access Token', status_code=500)
-
-        return r.json()
+        return self.get_client().get_token(code, request.base_url)
 
     def response_handler(self, callback):
         """Specifies the response handler function. This function receives a
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+    flask_urs.callback
+    ~~~~~~~~~~~~~~~~~~
+
+    Responses returned by the default response handler once a user has logged
+    in. ``URS_CALLBACK_MODE`` selects one of
+
+    * ``template``: render ``URS_CALLBACK_TEMPLATE`` with the `jwt`
+    * ``json``: return ``{"jwt": ...}``
+    * ``fragment``: redirect to ``URS_CALLBACK_REDIRECT`` with ``#jwt=...``
+
+    Jinja caches the template once it has been rendered. To keep compiling it
+    off the first login, call :func:`precompile_callback_template` at startup,
+    e.g. at the end of an app factory or in a pre-fork server's preload hook.
+"""
+
+from flask import current_app, jsonify, redirect, render_template
+
+CALLBACK_MODES = ('template', 'json', 'fragment')
+
+
+def check_callback_mode(mode):
+    if mode not in CALLBACK_MODES:
+        raise ValueError('URS_CALLBACK_MODE must be one of %s' % ', '.join(CALLBACK_MODES))
+
+
+def precompile_callback_template(app):
+    """Compile ``URS_CALLBACK_TEMPLATE`` into the Jinja cache of `app`, so that
+    the first login does not pay for it. Does nothing unless the app is in
+    ``template`` mode. Call it once the app is fully configured, since it
+    creates the app's Jinja environment. Example::
+
+        app = create_app()
+        precompile_callback_template(app)
+
+    :param app: the Flask app
+    """
+    if app.config['URS_CALLBACK_MODE'] == 'template':
+        app.jinja_env.get_template(app.config['URS_CALLBACK_TEMPLATE'])
+
+
+def callback_response(jwt):
+    """Build the login response for `jwt` according to ``URS_CALLBACK_MODE``."""
+    config = current_app.config
+    mode = config['URS_CALLBACK_MODE']
+
+    if mode == 'json':
+        return jsonify({'jwt': jwt})
+
+    elif mode == 'fragment':
+        return redirect('%s#jwt=%s' % (config['URS_CALLBACK_REDIRECT'], jwt))
+
+    check_callback_mode(mode)
+    return render_template(config['URS_CALLBACK_TEMPLATE'], jwt=jwt)
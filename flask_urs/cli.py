@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+    flask_urs.cli
+    ~~~~~~~~~~~~~
+
+    `flask urs` commands for minting, auditing and re-signing tokens and for
+    publishing signing keys without running the web application.
+"""
+
+import base64
+import json
+import os
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from itsdangerous import TimedJSONWebSignatureSerializer, SignatureExpired, BadSignature
+
+from . import _get_serializer, _default_encode_handler
+
+urs_cli = AppGroup('urs', help='Flask-URS token and key administration.')
+
+# `init_app` imports this module for every app, so modules only needed by a
+# single command (multiprocessing, hashlib, ...) are imported in that command.
+
+# Application used by `verify` worker processes. Set in the parent right before
+# the pool forks so every worker inherits it without pickling.
+_worker_app = None
+
+
+class _FixedExpirySerializer(TimedJSONWebSignatureSerializer):
+    """Signs tokens that expire at `exp` instead of `expires_in` from now."""
+
+    def __init__(self, secret_key, exp, **kwargs):
+        super(_FixedExpirySerializer, self).__init__(secret_key, **kwargs)
+        self.exp = exp
+
+    def make_header(self, header_fields):
+        header = super(_FixedExpirySerializer, self).make_header(header_fields)
+        header['exp'] = self.exp
+        return header
+
+
+def _b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _as_bytes(key):
+    if isinstance(key, bytes):
+        return key
+    return key.encode('utf-8')
+
+
+def _read_tokens(stream):
+    for lineno, line in enumerate(stream, 1):
+        token = line.strip()
+        if token:
+            yield lineno, token
+
+
+def _read_key(f):
+    key = f.read().rstrip('\r\n')
+    if not key:
+        raise click.BadParameter('%s is empty' % f.name)
+    return key
+
+
+def _decode(token):
+    try:
+        return current_app.extensions['urs'].decode_callback(token), None
+    except SignatureExpired:
+        return None, 'Token is expired'
+    except BadSignature:
+        return None, 'Token is undecipherable'
+
+
+def _verify_line(item):
+    lineno, token = item
+    payload, error = _decode(token)
+    if error is not None:
+        return {'line': lineno, 'valid': False, 'error': error}
+    return {'line': lineno, 'valid': True, 'payload': payload}
+
+
+def _init_worker():
+    _worker_app.app_context().push()
+
+
+def _fork_context():
+    """Return a multiprocessing context that forks, None where forking is unavailable."""
+    import multiprocessing
+
+    if not hasattr(multiprocessing, 'get_context'):  # pragma: no cover
+        return multiprocessing if os.name == 'posix' else None
+    if 'fork' not in multiprocessing.get_all_start_methods():  # pragma: no cover
+        return None
+    return multiprocessing.get_context('fork')
+
+
+@urs_cli.command('mint')
+@click.argument('payload', required=False)
+@click.option('--count', '-n', default=1, show_default=True,
+              help='Number of tokens to mint for each payload.')
+def mint(payload, count):
+    """Mint tokens with the configured encode handler.
+
+    PAYLOAD is a JSON object. Without it, one JSON payload per line is read
+    from stdin.
+    """
+    encode = current_app.extensions['urs'].encode_callback
+
+    if payload is not None:
+        payloads = [payload]
+    else:
+        payloads = (line for line in click.get_text_stream('stdin') if line.strip())
+
+    for raw in payloads:
+        try:
+            data = json.loads(raw)
+        except ValueError as e:
+            raise click.BadParameter('invalid JSON payload: %s' % e)
+        for _ in range(count):
+            click.echo(encode(data))
+
+
+@urs_cli.command('verify')
+@click.argument('tokens', type=click.File('r'), default='-')
+@click.option('--jobs', '-j', default=0, show_default=True,
+              help='Worker processes, 0 for one per core.')
+@click.option('--chunk-size', default=1024, show_default=True,
+              help='Tokens handed to a worker at a time.')
+@click.option('--invalid-only', is_flag=True, help='Only report tokens that fail.')
+def verify(tokens, jobs, chunk_size, invalid_only):
+    """Decode and verify tokens, one per line, from TOKENS or stdin.
+
+    Writes one JSON result per token to stdout, in input order, and a summary
+    to stderr.
+    """
+    global _worker_app
+
+    context = _fork_context()
+    jobs = jobs or (context.cpu_count() if context is not None else 1)
+    if context is None:
+        jobs = 1
+
+    items = _read_tokens(tokens)
+    pool = None
+    completed = False
+    total = valid = 0
+
+    try:
+        if jobs > 1:
+            _worker_app = current_app._get_current_object()
+            pool = context.Pool(jobs, initializer=_init_worker)
+            results = pool.imap(_verify_line, items, chunk_size)
+        else:
+            results = (_verify_line(item) for item in items)
+
+        for result in results:
+            total += 1
+            if result['valid']:
+                valid += 1
+                if invalid_only:
+                    continue
+            click.echo(json.dumps(result, sort_keys=True))
+        completed = True
+    finally:
+        # Stopping early, e.g. on a closed pipe or Ctrl-C, must not wait for the
+        # workers to get through the rest of the input.
+        if pool is not None:
+            if completed:
+                pool.close()
+            else:
+                pool.terminate()
+            pool.join()
+        _worker_app = None
+
+    click.echo('%d tokens, %d valid, %d invalid' % (total, valid, total - valid), err=True)
+
+
+@urs_cli.command('rotate-key')
+@click.option('--key-file', type=click.File('r'),
+              help='File holding the new signing key. Generated when omitted.')
+@click.option('--bytes', 'nbytes', default=32, show_default=True,
+              help='Size of a generated key.')
+@click.option('--resign', type=click.File('r'),
+              help='Re-sign the tokens in this file (- for stdin) with the new key.')
+def rotate_key(key_file, nbytes, resign):
+    """Generate a new signing key and optionally re-sign existing tokens.
+
+    Without --resign the new key is written to stdout. With it, re-signed tokens
+    go to stdout and a generated key goes to stderr. Re-signed tokens keep the
+    expiry of the original. Tokens that no longer verify under the current key,
+    or have expired, are skipped. Keys are read from files rather than taken as
+    arguments so that they do not show up in process lists or shell history.
+    """
+    import binascii
+
+    if resign is not None and \
+            current_app.extensions['urs'].encode_callback is not _default_encode_handler:
+        raise click.UsageError('--resign only supports the default encode handler')
+
+    key = _read_key(key_file) if key_file is not None else None
+
+    if key is None:
+        key = binascii.hexlify(os.urandom(nbytes)).decode('ascii')
+        if resign is None:
+            click.echo(key)
+            return
+        click.echo(key, err=True)
+    elif resign is None:
+        raise click.UsageError('--key-file is only useful together with --resign')
+
+    serializer = _get_serializer()
+    skipped = 0
+
+    for lineno, token in _read_tokens(resign):
+        try:
+            payload, header = serializer.loads(token, return_header=True)
+        except SignatureExpired:
+            error = 'Token is expired'
+        except BadSignature:
+            error = 'Token is undecipherable'
+        else:
+            error = None if 'exp' in header else 'Token has no expiry'
+
+        if error is not None:
+            skipped += 1
+            click.echo('line %d: %s' % (lineno, error), err=True)
+            continue
+
+        resigner = _FixedExpirySerializer(key, header['exp'],
+                                          algorithm_name=current_app.config['JWT_ALGORITHM'])
+        click.echo(resigner.dumps(payload).decode('utf-8'))
+
+    if skipped:
+        click.echo('%d tokens skipped' % skipped, err=True)
+
+
+@urs_cli.command('jwks')
+@click.argument('output', type=click.Path(dir_okay=False, allow_dash=True), default='-')
+@click.option('--key-file', 'key_files', type=click.File('r'), multiple=True,
+              help='File holding an additional key to publish, e.g. the previous key '
+                   'during rotation.')
+def jwks(output, key_files):
+    """Write the signing keys as a JSON Web Key Set to OUTPUT.
+
+    The configured algorithms are symmetric, so the set contains the secret
+    keys themselves. Only distribute it to trusted verifying services; files
+    are created readable by the owner only.
+    """
+    algorithm = current_app.config['JWT_ALGORITHM']
+    if not algorithm.startswith('HS'):
+        raise click.UsageError('cannot export keys for algorithm %s' % algorithm)
+
+    import hashlib
+    import tempfile
+
+    keys = []
+    secrets = [current_app.config['JWT_SECRET_KEY']] + [_read_key(f) for f in key_files]
+    for secret in secrets:
+        k = _b64url(_as_bytes(secret))
+        thumbprint = hashlib.sha256(
+            json.dumps({'k': k, 'kty': 'oct'}, separators=(',', ':'),
+                       sort_keys=True).encode('utf-8')).digest()
+        keys.append({
+            'kty': 'oct',
+            'use': 'sig',
+            'alg': algorithm,
+            'kid': _b64url(thumbprint),
+            'k': k,
+        })
+
+    document = json.dumps({'keys': keys}, indent=2, sort_keys=True)
+
+    if output == '-':
+        click.echo(document)
+        return
+
+    # mkstemp creates the file with mode 0600; renaming it into place replaces an
+    # existing file together with its permissions.
+    fd, path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(output)),
+                                prefix='.jwks-')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(document + '\n')
+        os.rename(path, output)
+    except Exception:
+        os.unlink(path)
+        raise
+    click.echo('wrote %d keys to %s' % (len(keys), output), err=True)
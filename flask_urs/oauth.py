@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+    flask_urs.oauth
+    ~~~~~~~~~~~~~~~
+
+    URS Oauth2 client. Kept out of the core module so that services which only
+    verify tokens never pay for importing `requests`.
+"""
+
+from multiprocessing.pool import ThreadPool
+
+import requests
+
+from . import URSError, CONFIG_DEFAULTS
+
+try:
+    from http.cookiejar import DefaultCookiePolicy
+except ImportError:  # pragma: no cover
+    from cookielib import DefaultCookiePolicy
+
+
+def _json(response):
+    try:
+        return response.json()
+    except ValueError:
+        raise URSError('Invalid Response', 'URS Returned Invalid JSON', status_code=500)
+
+
+class URSClient(object):
+    """Client for the URS token and profile endpoints.
+
+    A client is configured once and is immutable afterwards, and it does not
+    need Flask app or request contexts, e.g. in background jobs. All calls go
+    through one pooled `requests` session that never stores cookies, so no state
+    from one user's request reaches another's. The only state shared between
+    threads is then urllib3's connection pool, which is built for concurrent
+    use, so one instance can be shared between threads even though `requests`
+    does not document `Session` as thread safe. Example::
+
+        client = URSClient.from_config(app.config)
+        profiles = client.get_users([(token, endpoint) for token, endpoint in rows])
+
+    :param host: the URS host, e.g. ``https://urs.earthdata.nasa.gov/``
+    :param uid: the application UID
+    :param password: the application password
+    :param token_path: the token endpoint, relative to `host`
+    :param timeout: timeout in seconds of every URS request, None to wait forever
+    :param pool_size: connections kept per host, also the bound of concurrent
+        calls in :meth:`get_users`. Threads beyond it open connections that are
+        discarded afterwards, so size it for all threads sharing the client.
+    """
+
+    __slots__ = ('_host', '_uid', '_password', '_token_path', '_timeout', '_pool_size',
+                 '_session')
+
+    def __init__(self, host, uid=None, password=None, token_path='oauth/token', timeout=None,
+                 pool_size=10):
+        if pool_size < 1:
+            raise ValueError('pool_size must be at least 1, got %r' % pool_size)
+
+        session = requests.Session()
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        for name, value in (('_host', host), ('_uid', uid), ('_password', password),
+                            ('_token_path', token_path), ('_timeout', timeout),
+                            ('_pool_size', pool_size), ('_session', session)):
+            object.__setattr__(self, name, value)
+
+    @classmethod
+    def from_config(cls, config):
+        """Create a client from a Flask config, falling back to `CONFIG_DEFAULTS`."""
+        def get(key):
+            return config.get(key, CONFIG_DEFAULTS.get(key))
+
+        return cls(get('URS_HOST'), uid=get('URS_UID'), password=get('URS_PASSWORD'),
+                   token_path=get('URS_TOKEN_PATH'), timeout=get('URS_TIMEOUT'),
+                   pool_size=get('URS_POOL_SIZE'))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('URSClient is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('URSClient is immutable')
+
+    def __repr__(self):
+        return '<URSClient %s>' % self._host
+
+    @property
+    def host(self):
+        return self._host
+
+    @property
+    def uid(self):
+        return self._uid
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @property
+    def pool_size(self):
+        return self._pool_size
+
+    @property
+    def token_url(self):
+        return self._host + self._token_path
+
+    def close(self):
+        """Close the pooled connections."""
+        self._session.close()
+
+    def _request_token(self, data):
+        headers = {
+            "Content-Type": "application/x-www-form-urlencoded"
+        }
+
+        auth = requests.auth.HTTPBasicAuth(self._uid, self._password)
+
+        r = self._session.post(self.token_url, headers=headers, data=data, auth=auth,
+                               timeout=self._timeout)
+
+        if r.status_code == 401:
+            raise URSError('Token Access Denied', 'Incorrect Application UID or Password',
+                           status_code=500)
+
+        elif r.status_code == 400:
+            error = _json(r)
+            raise URSError(error['error'], error['error_description'], status_code=500)
+
+        elif r.status_code != 200:
+            raise URSError('Unknown Error', 'Could Not Retrieve Access Token', status_code=500)
+
+        return _json(r)
+
+    def get_token(self, code, redirect_uri):
+        """Exchange an authorization code for an access token.
+
+        :param code: the authorization code returned to the callback
+        :param redirect_uri: the redirect uri the code was issued for
+        """
+        return self._request_token({
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": redirect_uri
+        })
+
+    def refresh(self, refresh_token):
+        """Get a new access token for a refresh token.
+
+        :param refresh_token: the refresh token of an earlier token response
+        """
+        return self._request_token({
+            "grant_type": "refresh_token",
+            "refresh_token": refresh_token
+        })
+
+    def get_user(self, token, endpoint):
+        """Retrieve the URS profile for an access token.
+
+        :param token: the access token
+        :param endpoint: the profile endpoint of the token response
+        """
+        headers = {
+            "Authorization": "Bearer %s" % token
+        }
+
+        r = self._session.get(self._host + endpoint, headers=headers, timeout=self._timeout)
+
+        if r.status_code != 200:
+            raise URSError('Invalid Code', 'No Authorization Code')
+
+        return _json(r)
+
+    def get_users(self, tokens, max_workers=None, return_exceptions=False):
+        """Retrieve several URS profiles concurrently.
+
+        Profiles are returned in the order of `tokens`. At most `max_workers`
+        requests are in flight at once, never more than `pool_size` so that every
+        request reuses a pooled connection.
+
+        :param tokens: iterable of ``(token, endpoint)`` pairs
+        :param max_workers: bound of concurrent requests, by default `pool_size`
+        :param return_exceptions: return a failed lookup's `URSError` or
+            `requests.RequestException` in place of its profile instead of raising
+        """
+        if max_workers is None:
+            max_workers = self._pool_size
+        elif max_workers < 1:
+            raise ValueError('max_workers must be at least 1, got %r' % max_workers)
+
+        tokens = list(tokens)
+        if not tokens:
+            return []
+
+        def fetch(item):
+            try:
+                return self.get_user(*item)
+            except (URSError, requests.RequestException) as e:
+                if not return_exceptions:
+                    raise
+                return e
+
+        pool = ThreadPool(min(max_workers, self._pool_size, len(tokens)))
+        try:
+            return pool.map(fetch, tokens)
+        finally:
+            pool.close()
+            pool.join()
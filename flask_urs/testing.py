@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+    flask_urs.testing
+    ~~~~~~~~~~~~~~~~~
+
+    A fake URS server for local end-to-end and load testing. It implements the
+    token and profile endpoints used by `URS.callback` with configurable latency,
+    error rate and refresh token behavior, and reports request and connection
+    counts on ``/stats``. Run it standalone with::
+
+        python -m flask_urs.testing --port 5001 --latency 0.05
+"""
+
+import argparse
+import itertools
+import random
+import threading
+import time
+import uuid
+
+from flask import Flask, jsonify, request
+
+# Connection ids handed out by the handler of `make_server`, which passes them
+# to the app in this environ key.
+_connection_ids = itertools.count(1)
+CONNECTION_ID_KEY = 'flask_urs.connection_id'
+
+
+class ConnectionCounter(object):
+    """WSGI middleware that counts the distinct client connections it has seen.
+
+    Served by :func:`make_server`, every accepted socket is counted. Under other
+    servers connections are told apart by client address and port, so a port
+    reused by the client later in a long run is only counted once.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._lock = threading.Lock()
+        self._connections = set()
+
+    def __call__(self, environ, start_response):
+        key = environ.get(CONNECTION_ID_KEY) or \
+            (environ.get('REMOTE_ADDR'), environ.get('REMOTE_PORT'))
+        with self._lock:
+            self._connections.add(key)
+        return self.app(environ, start_response)
+
+    @property
+    def connections(self):
+        with self._lock:
+            return len(self._connections)
+
+
+class _FakeURSState(object):
+    def __init__(self, expires_in, refresh_expires_in, rotate_refresh_tokens):
+        self.expires_in = expires_in
+        self.refresh_expires_in = refresh_expires_in
+        self.rotate_refresh_tokens = rotate_refresh_tokens
+        self.lock = threading.Lock()
+        self.access_tokens = {}
+        self.refresh_tokens = {}
+        self.counts = {}
+        self.next_sweep = 0
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def _sweep(self, now):
+        """Drop expired tokens, at most once a second. Requires `lock`."""
+        if now < self.next_sweep:
+            return
+        self.next_sweep = now + 1
+        for tokens in (self.access_tokens, self.refresh_tokens):
+            for token in [t for t, (_, expires) in tokens.items() if expires < now]:
+                del tokens[token]
+
+    def issue(self, uid):
+        access, refresh = uuid.uuid4().hex, uuid.uuid4().hex
+        now = time.time()
+        with self.lock:
+            self._sweep(now)
+            self.access_tokens[access] = (uid, now + self.expires_in)
+            self.refresh_tokens[refresh] = (uid, now + self.refresh_expires_in)
+        return {
+            'access_token': access,
+            'refresh_token': refresh,
+            'token_type': 'Bearer',
+            'expires_in': self.expires_in,
+            'endpoint': '/api/users/%s' % uid
+        }
+
+    def _lookup(self, tokens, token, remove=False):
+        with self.lock:
+            if remove:
+                uid, expires = tokens.pop(token, (None, 0))
+            else:
+                uid, expires = tokens.get(token, (None, 0))
+        if expires < time.time():
+            return None
+        return uid
+
+    def refresh(self, refresh_token):
+        return self._lookup(self.refresh_tokens, refresh_token,
+                            remove=self.rotate_refresh_tokens)
+
+    def user_for(self, access_token):
+        return self._lookup(self.access_tokens, access_token)
+
+
+def _oauth_error(error, description):
+    return jsonify({'error': error, 'error_description': description}), 400
+
+
+def _profile(uid):
+    return {
+        'uid': uid,
+        'email_address': '%s@example.com' % uid,
+        'first_name': 'Load',
+        'last_name': 'Test',
+        'affiliation': 'Government',
+        'organization': 'Flask-URS',
+        'user_type': 'Science Team',
+        'country': 'United States'
+    }
+
+
+def create_fake_urs(uid=None, password=None, latency=0.0, jitter=0.0, error_rate=0.0,
+                    expires_in=3600, refresh_expires_in=86400, rotate_refresh_tokens=True,
+                    seed=None):
+    """Create a Flask app that behaves like the URS token and profile endpoints.
+
+    Any authorization code is accepted and becomes the uid of the user it logs
+    in. The app is wrapped in a :class:`ConnectionCounter`, exposed as
+    ``app.connection_counter``. Expired tokens are dropped as new ones are
+    issued, so memory grows with the login rate times the token lifetimes; keep
+    them short for long load runs.
+
+    :param uid: application UID required on the token endpoint, any when None
+    :param password: application password required on the token endpoint
+    :param latency: seconds added to every token and profile response
+    :param jitter: upper bound of a uniformly random extra delay in seconds
+    :param error_rate: fraction of token and profile requests answered with a 500
+    :param expires_in: access token lifetime in seconds
+    :param refresh_expires_in: refresh token lifetime in seconds
+    :param rotate_refresh_tokens: invalidate a refresh token once it is used
+    :param seed: seed for the latency and error random generator
+    """
+    app = Flask(__name__)
+    state = _FakeURSState(expires_in, refresh_expires_in, rotate_refresh_tokens)
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    def simulate():
+        with rng_lock:
+            delay = latency + (rng.uniform(0, jitter) if jitter else 0)
+            fail = error_rate and rng.random() < error_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            state.count('errors')
+            return jsonify({'error': 'server_error'}), 500
+
+    def authorized():
+        if uid is None:
+            return True
+        auth = request.authorization
+        return auth is not None and auth.username == uid and auth.password == password
+
+    @app.route('/oauth/token', methods=['POST'])
+    def token():
+        state.count('token')
+        error = simulate()
+        if error is not None:
+            return error
+
+        if not authorized():
+            return jsonify({'error': 'invalid_client'}), 401
+
+        grant_type = request.form.get('grant_type')
+
+        if grant_type == 'authorization_code':
+            code = request.form.get('code')
+            if not code:
+                return _oauth_error('invalid_request', 'Missing code')
+            return jsonify(state.issue(code))
+
+        elif grant_type == 'refresh_token':
+            state.count('refresh')
+            user = state.refresh(request.form.get('refresh_token'))
+            if user is None:
+                return _oauth_error('invalid_grant', 'Invalid refresh token')
+            return jsonify(state.issue(user))
+
+        return _oauth_error('unsupported_grant_type', 'Unsupported grant type')
+
+    @app.route('/api/users/<user>')
+    def profile(user):
+        state.count('profile')
+        error = simulate()
+        if error is not None:
+            return error
+
+        auth = request.headers.get('Authorization', '').split()
+        if len(auth) != 2 or state.user_for(auth[1]) != user:
+            return jsonify({'error': 'invalid_token'}), 401
+
+        return jsonify(_profile(user))
+
+    @app.route('/stats')
+    def stats():
+        with state.lock:
+            counts = dict(state.counts)
+        counts['connections'] = app.connection_counter.connections
+        return jsonify(counts)
+
+    app.connection_counter = ConnectionCounter(app.wsgi_app)
+    app.wsgi_app = app.connection_counter
+
+    return app
+
+
+def make_server(app, host='127.0.0.1', port=0):
+    """Return a threaded, keep-alive werkzeug server for `app`.
+
+    The development server defaults to HTTP/1.0, which closes every connection
+    and would hide the effect of client connection pooling. Serve it with
+    ``server.serve_forever()``; a `port` of 0 picks a free port, available as
+    ``server.server_port``.
+    """
+    from werkzeug import serving
+
+    class KeepAliveHandler(serving.WSGIRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            self.connection_id = next(_connection_ids)
+            serving.WSGIRequestHandler.setup(self)
+
+        def make_environ(self):
+            environ = serving.WSGIRequestHandler.make_environ(self)
+            environ[CONNECTION_ID_KEY] = self.connection_id
+            return environ
+
+    return serving.make_server(host, port, app, threaded=True,
+                               request_handler=KeepAliveHandler)
+
+
+def main():  # pragma: no cover
+    parser = argparse.ArgumentParser(description='Run a fake URS server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--uid')
+    parser.add_argument('--password')
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--expires-in', type=int, default=3600)
+    parser.add_argument('--refresh-expires-in', type=int, default=86400)
+    parser.add_argument('--no-rotate-refresh-tokens', action='store_true')
+    args = parser.parse_args()
+
+    app = create_fake_urs(uid=args.uid, password=args.password, latency=args.latency,
+                          jitter=args.jitter, error_rate=args.error_rate,
+                          expires_in=args.expires_in,
+                          refresh_expires_in=args.refresh_expires_in,
+                          rotate_refresh_tokens=not args.no_rotate_refresh_tokens)
+    make_server(app, args.host, args.port).serve_forever()
+
+
+if __name__ == '__main__':  # pragma: no cover
+    main()
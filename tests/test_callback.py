@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.test_callback
+    ~~~~~~~~~~~~~~~~~~~
+
+    Callback response tests
+"""
+from flask import Flask, json, signals_available, before_render_template, template_rendered
+
+from jinja2 import ChoiceLoader, DictLoader
+
+import responses
+
+import pytest
+
+import flask_urs
+from flask_urs.callback import precompile_callback_template
+
+
+def callback(app, client):
+    return client.get(
+        app.config.get("URS_URL_PREFIX") + app.config.get("URS_CALLBACK_RULE") + "?code=x")
+
+
+def test_invalid_callback_mode():
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'super-secret'
+    app.config['URS_CALLBACK_MODE'] = 'bogus'
+    with pytest.raises(ValueError):
+        flask_urs.URS(app)
+
+
+@responses.activate
+@pytest.mark.usefixtures("fake_oauth_success")
+def test_default_template(app, client):
+    r = callback(app, client)
+    assert r.status_code == 200
+    assert b'Hello World' in r.data
+
+
+@responses.activate
+@pytest.mark.usefixtures("fake_oauth_success")
+def test_configured_template(app, client):
+    app.jinja_env.loader = ChoiceLoader([
+        DictLoader({'custom.html': 'custom {{ jwt }}'}),
+        app.jinja_env.loader
+    ])
+    app.config['URS_CALLBACK_TEMPLATE'] = 'custom.html'
+
+    r = callback(app, client)
+    assert r.status_code == 200
+    assert r.data.startswith(b'custom ')
+
+
+def test_precompile_callback_template(app):
+    precompile_callback_template(app)
+    assert 'urs/callback.html' in [key[1] for key in app.jinja_env.cache.keys()]
+
+
+def test_precompile_skipped_outside_template_mode(app):
+    app.config['URS_CALLBACK_MODE'] = 'json'
+    app.config['URS_CALLBACK_TEMPLATE'] = 'missing.html'
+    precompile_callback_template(app)
+
+
+def test_precompile_exported():
+    assert flask_urs.precompile_callback_template is precompile_callback_template
+
+
+@pytest.mark.skipif(not signals_available, reason='requires blinker')
+@responses.activate
+@pytest.mark.usefixtures("fake_oauth_success")
+def test_template_signals(app, client):
+    sent = []
+
+    def record(sender, template, context, **extra):
+        sent.append((template.name, context['jwt']))
+
+    with before_render_template.connected_to(record, app), \
+            template_rendered.connected_to(record, app):
+        callback(app, client)
+
+    assert [name for name, _ in sent] == ['urs/callback.html'] * 2
+
+
+@responses.activate
+@pytest.mark.usefixtures("fake_oauth_success")
+def test_unknown_mode_after_init(app, client):
+    app.config['URS_CALLBACK_MODE'] = 'bogus'
+    with pytest.raises(ValueError):
+        callback(app, client)
+
+
+@responses.activate
+@pytest.mark.usefixtures("fake_oauth_success")
+def test_json_mode(app, client):
+    app.config['URS_CALLBACK_MODE'] = 'json'
+
+    r = callback(app, client)
+    assert r.status_code == 200
+    assert 'jwt' in json.loads(r.data)
+
+
+@responses.activate
+@pytest.mark.usefixtures("fake_oauth_success")
+def test_fragment_mode(app, client, urs):
+    app.config['URS_CALLBACK_MODE'] = 'fragment'
+    app.config['URS_CALLBACK_REDIRECT'] = '/app'
+
+    r = callback(app, client)
+    assert r.status_code == 302
+    location, jwt = r.headers['Location'].split('#jwt=')
+    assert location.endswith('/app')
+    assert urs.decode_callback(jwt)['uid'] == 'username'
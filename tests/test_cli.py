@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.test_cli
+    ~~~~~~~~~~~~~~
+
+    Flask-URS CLI tests
+"""
+import json
+import os
+import stat
+
+from click.testing import CliRunner
+
+from flask.cli import ScriptInfo
+
+from itsdangerous import TimedJSONWebSignatureSerializer
+
+import pytest
+
+from flask_urs.cli import urs_cli, _fork_context
+
+
+@pytest.fixture(scope='function')
+def invoke(app):
+    runner = CliRunner()
+
+    def invoke(args, input=None):
+        info = ScriptInfo(create_app=lambda *args: app)
+        return runner.invoke(urs_cli, args, input=input, obj=info)
+
+    return invoke
+
+
+def write_key(tmpdir, key):
+    path = tmpdir.join(key)
+    path.write(key + '\n')
+    return str(path)
+
+
+def test_cli_registered(app):
+    assert 'urs' in app.cli.commands
+
+
+def test_mint_and_verify(invoke, app, user):
+    app.config['JWT_EXPIRATION_DELTA'] = 3600
+    r = invoke(['mint', json.dumps(user), '--count', '3'])
+    assert r.exit_code == 0
+    tokens = r.output.split()
+    assert len(tokens) == 3
+
+    r = invoke(['verify', '--jobs', '1'], input='\n'.join(tokens + ['bogus']) + '\n')
+    assert r.exit_code == 0
+    results = [json.loads(line) for line in r.output.splitlines() if line.startswith('{')]
+    assert [res['valid'] for res in results] == [True, True, True, False]
+    assert results[0]['payload'] == user
+    assert results[3] == {'line': 4, 'valid': False, 'error': 'Token is undecipherable'}
+
+
+@pytest.mark.skipif(_fork_context() is None, reason='requires fork')
+def test_verify_parallel_keeps_order(invoke, app, urs):
+    app.config['JWT_EXPIRATION_DELTA'] = 3600
+    lines = []
+    for i in range(50):
+        lines.append(urs.encode_callback({'uid': 'user%d' % i}) if i % 7 else 'bogus%d' % i)
+
+    r = invoke(['verify', '--jobs', '2', '--chunk-size', '3'], input='\n'.join(lines) + '\n')
+    assert r.exit_code == 0
+    results = [json.loads(line) for line in r.output.splitlines() if line.startswith('{')]
+    assert [res['line'] for res in results] == list(range(1, 51))
+    for i, res in enumerate(results):
+        assert res['valid'] == bool(i % 7)
+        if res['valid']:
+            assert res['payload'] == {'uid': 'user%d' % i}
+    assert '50 tokens, 42 valid, 8 invalid' in r.output
+
+
+@pytest.mark.skipif(_fork_context() is None, reason='requires fork')
+def test_verify_parallel_stops_early(invoke, app, urs, monkeypatch):
+    import flask_urs.cli
+
+    def broken_pipe(message=None, **kwargs):
+        if not kwargs.get('err'):
+            raise IOError('broken pipe')
+
+    monkeypatch.setattr(flask_urs.cli.click, 'echo', broken_pipe)
+
+    r = invoke(['verify', '--jobs', '2', '--chunk-size', '1'], input='bogus\n' * 10000)
+    assert isinstance(r.exception, IOError)
+    assert flask_urs.cli._worker_app is None
+
+
+def test_mint_from_stdin(invoke, user):
+    r = invoke(['mint'], input=json.dumps(user) + '\n\n' + json.dumps({'uid': 'x'}) + '\n')
+    assert r.exit_code == 0
+    assert len(r.output.split()) == 2
+
+
+def test_verify_invalid_only(invoke, urs, user):
+    token = urs.encode_callback(user)
+    r = invoke(['verify', '--jobs', '1', '--invalid-only'], input=token + '\nbogus\n')
+    assert r.exit_code == 0
+    assert '"line": 1' not in r.output
+    assert '"line": 2' in r.output
+
+
+def test_rotate_key(invoke):
+    r = invoke(['rotate-key', '--bytes', '16'])
+    assert r.exit_code == 0
+    assert len(r.output.strip()) == 32
+
+
+def test_rotate_key_resign(invoke, app, urs, user, tmpdir):
+    app.config['JWT_EXPIRATION_DELTA'] = 3600
+    token = urs.encode_callback(user)
+    key_file = write_key(tmpdir, 'new-secret')
+    r = invoke(['rotate-key', '--key-file', key_file, '--resign', '-'], input=token + '\n')
+    assert r.exit_code == 0
+
+    serializer = TimedJSONWebSignatureSerializer(secret_key='new-secret')
+    assert serializer.loads(r.output.strip())['uid'] == user['uid']
+    assert app.config['JWT_SECRET_KEY'] == 'super-secret'
+
+
+def test_rotate_key_resign_keeps_expiry(invoke, app, urs, user, tmpdir):
+    app.config['JWT_EXPIRATION_DELTA'] = 3600
+    token = urs.encode_callback(user)
+    _, original = TimedJSONWebSignatureSerializer('super-secret').loads(
+        token, return_header=True)
+
+    # A longer configured lifetime must not extend re-signed tokens.
+    app.config['JWT_EXPIRATION_DELTA'] = 7200
+    key_file = write_key(tmpdir, 'new-secret')
+    r = invoke(['rotate-key', '--key-file', key_file, '--resign', '-'], input=token + '\n')
+    assert r.exit_code == 0
+
+    _, resigned = TimedJSONWebSignatureSerializer('new-secret').loads(
+        r.output.strip(), return_header=True)
+    assert resigned['exp'] <= original['exp']
+
+
+def test_rotate_key_resign_custom_encode_handler(invoke, urs):
+    @urs.encode_handler
+    def encode_data(payload):
+        return 'custom'
+
+    r = invoke(['rotate-key', '--resign', '-'], input='token\n')
+    assert r.exit_code != 0
+    assert 'default encode handler' in r.output
+
+
+def test_jwks(invoke, tmpdir):
+    path = str(tmpdir.join('jwks.json'))
+    r = invoke(['jwks', path, '--key-file', write_key(tmpdir, 'old-secret')])
+    assert r.exit_code == 0
+
+    with open(path) as f:
+        keys = json.load(f)['keys']
+    assert len(keys) == 2
+    assert keys[0]['kty'] == 'oct'
+    assert keys[0]['alg'] == 'HS256'
+    assert keys[0]['k'] == 'c3VwZXItc2VjcmV0'
+    assert keys[0]['kid'] != keys[1]['kid']
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='requires POSIX permissions')
+def test_jwks_replaces_readable_file(invoke, tmpdir):
+    path = tmpdir.join('jwks.json')
+    path.write('{}')
+    path.chmod(0o644)
+
+    r = invoke(['jwks', str(path)])
+    assert r.exit_code == 0
+    assert stat.S_IMODE(os.stat(str(path)).st_mode) == 0o600
+    assert 'keys' in json.loads(path.read())
+    assert [p.basename for p in tmpdir.listdir()] == ['jwks.json']
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.test_client
+    ~~~~~~~~~~~~~~~~~
+
+    URSClient tests
+"""
+import threading
+
+import responses
+
+import pytest
+
+import flask_urs
+from flask_urs import oauth
+from flask_urs.oauth import URSClient
+
+HOST = 'https://urs.example.com/'
+
+
+@pytest.fixture(scope='function')
+def client():
+    return URSClient(HOST, uid='app', password='secret')
+
+
+def add_profile(uid, status=200):
+    responses.add(responses.GET, HOST + 'api/users/' + uid, json={'uid': uid}, status=status)
+
+
+def test_client_is_immutable(client):
+    with pytest.raises(AttributeError):
+        client.host = 'https://elsewhere/'
+    with pytest.raises(AttributeError):
+        client._session = None
+    assert client.token_url == HOST + 'oauth/token'
+
+
+def test_from_config(app):
+    client = URSClient.from_config(app.config)
+    assert client.host == app.config['URS_HOST']
+    assert client.pool_size == app.config['URS_POOL_SIZE']
+
+
+@responses.activate
+def test_get_token_and_user_without_app_context(client):
+    responses.add(responses.POST, client.token_url,
+                  json={'access_token': 'asdf', 'endpoint': 'api/users/joe'}, status=200)
+    add_profile('joe')
+
+    access = client.get_token('code', 'http://localhost/urs/callback')
+    assert client.get_user(access['access_token'], access['endpoint']) == {'uid': 'joe'}
+    assert responses.calls[0].request.headers['Authorization'].startswith('Basic ')
+
+
+@responses.activate
+def test_refresh(client):
+    responses.add(responses.POST, client.token_url, json={'access_token': 'new'}, status=200)
+
+    assert client.refresh('refresh')['access_token'] == 'new'
+    assert 'grant_type=refresh_token' in responses.calls[0].request.body
+
+
+@responses.activate
+def test_get_token_errors(client):
+    responses.add(responses.POST, client.token_url, status=401)
+
+    with pytest.raises(flask_urs.URSError) as e:
+        client.get_token('code', 'http://localhost/urs/callback')
+    assert e.value.error == 'Token Access Denied'
+
+
+@responses.activate
+def test_get_users(client):
+    uids = ['user%d' % i for i in range(20)]
+    for uid in uids:
+        add_profile(uid)
+
+    profiles = client.get_users([('token', 'api/users/' + uid) for uid in uids], max_workers=4)
+    assert [p['uid'] for p in profiles] == uids
+
+
+@responses.activate
+def test_get_users_errors(client):
+    add_profile('joe')
+    add_profile('bob', status=401)
+    tokens = [('token', 'api/users/joe'), ('token', 'api/users/bob')]
+
+    with pytest.raises(flask_urs.URSError):
+        client.get_users(tokens)
+
+    profiles = client.get_users(tokens, return_exceptions=True)
+    assert profiles[0] == {'uid': 'joe'}
+    assert isinstance(profiles[1], flask_urs.URSError)
+
+
+@responses.activate
+def test_get_users_invalid_json(client):
+    add_profile('joe')
+    responses.add(responses.GET, HOST + 'api/users/bob', body='<html>', status=200)
+    tokens = [('token', 'api/users/joe'), ('token', 'api/users/bob')]
+
+    profiles = client.get_users(tokens, return_exceptions=True)
+    assert profiles[0] == {'uid': 'joe'}
+    assert profiles[1].error == 'Invalid Response'
+
+
+@responses.activate
+def test_get_users_bounded_by_pool_size(monkeypatch):
+    client = URSClient(HOST, pool_size=2)
+    sizes = []
+
+    class RecordingPool(oauth.ThreadPool):
+        def __init__(self, processes):
+            sizes.append(processes)
+            super(RecordingPool, self).__init__(processes)
+
+    monkeypatch.setattr(oauth, 'ThreadPool', RecordingPool)
+    for uid in ('a', 'b', 'c'):
+        add_profile(uid)
+
+    client.get_users([('token', 'api/users/' + uid) for uid in 'abc'], max_workers=10)
+    assert sizes == [2]
+
+
+@responses.activate
+def test_cookies_not_persisted(client):
+    responses.add(responses.GET, HOST + 'api/users/joe', json={'uid': 'joe'}, status=200,
+                  headers={'Set-Cookie': 'session=joe; Path=/'})
+    add_profile('bob')
+
+    client.get_user('token', 'api/users/joe')
+    client.get_user('token', 'api/users/bob')
+
+    assert 'Cookie' not in responses.calls[1].request.headers
+
+
+def test_invalid_sizes(client):
+    with pytest.raises(ValueError):
+        URSClient(HOST, pool_size=0)
+    with pytest.raises(ValueError):
+        client.get_users([('token', 'api/users/joe')], max_workers=0)
+
+
+def test_get_users_empty(client):
+    assert client.get_users([]) == []
+
+
+def test_extension_shares_client(app, urs):
+    client = urs.get_client()
+    assert isinstance(client, URSClient)
+    assert urs.get_client(app) is client
+
+
+def test_extension_client_created_once(app, urs, monkeypatch):
+    created = []
+    from_config = URSClient.from_config.__func__
+
+    def counting(cls, config):
+        created.append(cls)
+        return from_config(cls, config)
+
+    monkeypatch.setattr(URSClient, 'from_config', classmethod(counting))
+
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(urs.get_client(app)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(created) == 1
+    assert all(c is clients[0] for c in clients)
+    assert urs._token_url == client.token_url
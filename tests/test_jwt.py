@@ -5,6 +5,8 @@
 
     Flask-URS-JWT tests
 """
+import subprocess
+import sys
 import time
 
 from itsdangerous import TimedJSONWebSignatureSerializer
@@ -48,6 +50,21 @@ def test_initialize():
     assert len(app.url_map._rules) == 2
 
 
+def test_initialize_without_callback():
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'super-secret'
+    app.config['URS_CALLBACK_ENABLED'] = False
+    flask_urs.URS(app)
+    assert len(app.url_map._rules) == 1
+    assert 'urs_urs' not in app.blueprints
+
+
+def test_import_does_not_load_requests():
+    code = 'import sys, flask_urs; print("requests" in sys.modules)'
+    out = subprocess.check_output([sys.executable, '-c', code])
+    assert out.strip() == b'False'
+
+
 def test_jwt_required_decorator_with_valid_token(urs, client, user):
     token = urs.encode_callback(user)
     resp = client.get(
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+    tests.test_testing
+    ~~~~~~~~~~~~~~~~~~
+
+    Fake URS server tests
+"""
+import threading
+
+from flask import json
+
+import pytest
+
+import requests
+
+from flask_urs.testing import create_fake_urs, make_server, _FakeURSState
+
+
+def get_token(client, **data):
+    r = client.post('/oauth/token', data=data)
+    return r, json.loads(r.data)
+
+
+@pytest.fixture(scope='function')
+def fake():
+    return create_fake_urs().test_client()
+
+
+def test_authorization_code_grant(fake):
+    r, access = get_token(fake, grant_type='authorization_code', code='joe')
+    assert r.status_code == 200
+    assert access['endpoint'] == '/api/users/joe'
+
+    r = fake.get(access['endpoint'],
+                 headers={'Authorization': 'Bearer ' + access['access_token']})
+    assert r.status_code == 200
+    assert json.loads(r.data)['uid'] == 'joe'
+
+
+def test_profile_requires_token(fake):
+    r = fake.get('/api/users/joe', headers={'Authorization': 'Bearer bogus'})
+    assert r.status_code == 401
+
+
+def test_refresh_token_rotation(fake):
+    _, access = get_token(fake, grant_type='authorization_code', code='joe')
+
+    r, refreshed = get_token(fake, grant_type='refresh_token',
+                             refresh_token=access['refresh_token'])
+    assert r.status_code == 200
+    assert refreshed['access_token'] != access['access_token']
+
+    r, error = get_token(fake, grant_type='refresh_token',
+                         refresh_token=access['refresh_token'])
+    assert r.status_code == 400
+    assert error['error'] == 'invalid_grant'
+
+
+def test_client_credentials():
+    fake = create_fake_urs(uid='app', password='secret').test_client()
+    r, _ = get_token(fake, grant_type='authorization_code', code='joe')
+    assert r.status_code == 401
+
+
+def test_error_rate_and_stats():
+    fake = create_fake_urs(error_rate=1.0).test_client()
+    r, _ = get_token(fake, grant_type='authorization_code', code='joe')
+    assert r.status_code == 500
+
+    stats = json.loads(fake.get('/stats').data)
+    assert stats['token'] == 1
+    assert stats['errors'] == 1
+    assert stats['connections'] == 1
+
+
+def test_expired_tokens_dropped():
+    state = _FakeURSState(expires_in=-1, refresh_expires_in=-1, rotate_refresh_tokens=False)
+    access = state.issue('joe')
+    assert state.user_for(access['access_token']) is None
+    assert state.refresh(access['refresh_token']) is None
+
+    state.next_sweep = 0
+    state.issue('bob')
+    assert len(state.access_tokens) == 1
+    assert len(state.refresh_tokens) == 1
+
+
+def serve(app):
+    server = make_server(app)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def test_connections_counted_per_socket():
+    app = create_fake_urs()
+    server = serve(app)
+    url = 'http://127.0.0.1:%d/stats' % server.server_port
+    try:
+        session = requests.Session()
+        session.get(url)
+        assert session.get(url).json()['connections'] == 1
+        assert requests.Session().get(url).json()['connections'] == 2
+    finally:
+        server.shutdown()
+
+
+def test_callback_against_fake_server(app, client):
+    server = serve(create_fake_urs())
+
+    app.config['URS_HOST'] = 'http://127.0.0.1:%d' % server.server_port
+    app.config['URS_TOKEN_PATH'] = '/oauth/token'
+    try:
+        r = client.get(app.config['URS_URL_PREFIX'] + app.config['URS_CALLBACK_RULE'] +
+                       '?code=joe')
+    finally:
+        server.shutdown()
+
+    assert r.status_code == 200